@@ -7,13 +7,15 @@
 # For further information please visit http://www.aiida.net               #
 ###########################################################################
 """Tests for the 'verdi computer' command."""
-import os
-import tempfile
+from __future__ import annotations
+
+import dataclasses
 import textwrap
-from collections import OrderedDict
+import types
 
 import pytest
 from aiida import orm
+from aiida.cmdline.commands import cmd_computer
 from aiida.cmdline.commands.cmd_computer import (
     computer_configure,
     computer_delete,
@@ -23,45 +25,119 @@ from aiida.cmdline.commands.cmd_computer import (
     computer_setup,
     computer_show,
     computer_test,
+    verdi_computer,
+)
+from aiida.common.exceptions import NotExistent
+from aiida.orm.utils.builders.computer import ComputerBuilder
+from aiida.transports.plugins.local import LocalTransport
+
+SETUP_CONFIG_TEMPLATE = textwrap.dedent(
+    """\
+    ---
+    label: {label}
+    hostname: myhost
+    transport: core.local
+    scheduler: core.direct
+    """
+)
+
+CONFIGURE_CONFIG_TEMPLATE = textwrap.dedent(
+    """\
+    ---
+    safe_interval: {interval}
+    use_login_shell: {use_login_shell}
+    """
 )
 
 
-def generate_setup_options_dict(replace_args=None, non_interactive=True):
-    """Return a OrderedDict with the key-value pairs for the command line.
+SETUP_OPTIONS = types.MappingProxyType(
+    {
+        'non-interactive': None,
+        'label': 'noninteractive_computer',
+        'hostname': 'localhost',
+        'description': 'my description',
+        'transport': 'core.local',
+        'scheduler': 'core.direct',
+        'shebang': '#!/bin/bash',
+        'work-dir': '/scratch/{username}/aiida_run',
+        'mpirun-command': 'mpirun -np {tot_num_mpiprocs}',
+        'mpiprocs-per-machine': '2',
+        'default-memory-per-machine': '1000000',
+        # Make them multiline to test also multiline options
+        'prepend-text': "date\necho 'second line'",
+        'append-text': "env\necho '444'\necho 'third line'",
+    }
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class SetupExpectations:
+    """Attributes expected for a computer created by ``verdi computer setup`` with a given set of options.
+
+    The values have the types returned by the getters of :class:`~aiida.orm.Computer`, such that they can be compared
+    directly without parsing the command-line option strings again in every assertion.
+    """
+
+    label: str
+    description: str
+    hostname: str
+    transport: str
+    scheduler: str
+    shebang: str
+    work_dir: str
+    mpirun_command: list[str]
+    mpiprocs_per_machine: int | None
+    default_memory_per_machine: int | None
+    prepend_text: str
+    append_text: str
+
+    @classmethod
+    def from_options(cls, options):
+        """Return the expectations for the options as generated by ``generate_setup_options_dict()``.
+
+        Options that are not specified are expected to be unset.
+        """
+        mpiprocs_per_machine = options.get('mpiprocs-per-machine')
+        default_memory_per_machine = options.get('default-memory-per-machine')
+        return cls(
+            label=options['label'],
+            description=options['description'],
+            hostname=options['hostname'],
+            transport=options['transport'],
+            scheduler=options['scheduler'],
+            shebang=options['shebang'],
+            work_dir=options['work-dir'],
+            mpirun_command=options['mpirun-command'].split(),
+            mpiprocs_per_machine=None if mpiprocs_per_machine is None else int(mpiprocs_per_machine),
+            default_memory_per_machine=None if default_memory_per_machine is None else int(default_memory_per_machine),
+            prepend_text=options.get('prepend-text', ''),
+            append_text=options.get('append-text', ''),
+        )
 
-    I use an ordered dict because for changing entries it's easier
-    to have keys (so, a dict) but the commands might require a specific order,
-    so I use an OrderedDict.
 
-    This should be then passed to ``generate_setup_options()``.
+SETUP_EXPECTATIONS = SetupExpectations.from_options(SETUP_OPTIONS)
+
+
+def generate_setup_options_dict(replace_args=None, non_interactive=True):
+    """Return a dict with the key-value pairs for the command line.
+
+    The dict is a copy of ``SETUP_OPTIONS``, whose insertion order is the order in which the commands expect the
+    options. This should be then passed to ``generate_setup_options()``.
 
     :param replace_args: a dictionary with the keys to replace, if needed
-    :return: an OrderedDict with the command-line options
+    :param non_interactive: if ``False``, the ``non-interactive`` flag is omitted
+    :return: a dict with the command-line options
     """
-    valid_noninteractive_options = OrderedDict()
-
-    if non_interactive:
-        valid_noninteractive_options['non-interactive'] = None
-    valid_noninteractive_options['label'] = 'noninteractive_computer'
-    valid_noninteractive_options['hostname'] = 'localhost'
-    valid_noninteractive_options['description'] = 'my description'
-    valid_noninteractive_options['transport'] = 'core.local'
-    valid_noninteractive_options['scheduler'] = 'core.direct'
-    valid_noninteractive_options['shebang'] = '#!/bin/bash'
-    valid_noninteractive_options['work-dir'] = '/scratch/{username}/aiida_run'
-    valid_noninteractive_options['mpirun-command'] = 'mpirun -np {tot_num_mpiprocs}'
-    valid_noninteractive_options['mpiprocs-per-machine'] = '2'
-    valid_noninteractive_options['default-memory-per-machine'] = '1000000'
-    # Make them multiline to test also multiline options
-    valid_noninteractive_options['prepend-text'] = "date\necho 'second line'"
-    valid_noninteractive_options['append-text'] = "env\necho '444'\necho 'third line'"
-
-    # I replace kwargs here, so that if they are known, they go at the right order
+    options = dict(SETUP_OPTIONS)
+
+    if not non_interactive:
+        options.pop('non-interactive')
+
+    # Known keys are replaced in place, so they keep the right order
     if replace_args is not None:
-        for k in replace_args:
-            valid_noninteractive_options[k] = replace_args[k]
+        options.update(replace_args)
 
-    return valid_noninteractive_options
+    return options
 
 
 def generate_setup_options(ordereddict):
@@ -74,13 +150,7 @@ def generate_setup_options(ordereddict):
     :param ordereddict: as generated by ``generate_setup_options_dict()``
     :return: a list to be passed as command-line arguments.
     """
-    options = []
-    for key, value in ordereddict.items():
-        if value is None:
-            options.append(f'--{key}')
-        else:
-            options.append(f'--{key}={value}')
-    return options
+    return [f'--{key}' if value is None else f'--{key}={value}' for key, value in ordereddict.items()]
 
 
 def generate_setup_options_interactive(ordereddict):
@@ -93,13 +163,7 @@ def generate_setup_options_interactive(ordereddict):
     :param ordereddict: as generated by ``generate_setup_options_dict()``
     :return: a list to be passed as command-line arguments.
     """
-    options = []
-    for value in ordereddict.values():
-        if value is None:
-            options.append(True)
-        else:
-            options.append(value)
-    return options
+    return [True if value is None else value for value in ordereddict.values()]
 
 
 def test_help(run_cli_command):
@@ -107,26 +171,22 @@ def test_help(run_cli_command):
     run_cli_command(computer_setup, ['--help'])
 
 
-def test_reachable():
+def test_reachable(run_cli_command):
     """Test if the verdi computer setup is reachable."""
-    import subprocess as sp
-
-    output = sp.check_output(['verdi', 'computer', 'setup', '--help'])
-    assert b'Usage:' in output
+    result = run_cli_command(verdi_computer, ['setup', '--help'])
+    assert 'Usage:' in result.output
 
 
-def test_mixed(run_cli_command):
+def test_mixed(run_cli_command, monkeypatch):
     """Test verdi computer setup in mixed mode.
 
     Some parts are given interactively and some non-interactively.
     """
-    os.environ['VISUAL'] = 'sleep 1; vim -cwq'
-    os.environ['EDITOR'] = 'sleep 1; vim -cwq'
+    monkeypatch.setenv('VISUAL', 'vim -cwq')
+    monkeypatch.setenv('EDITOR', 'vim -cwq')
     label = 'mixed_computer'
 
     options_dict = generate_setup_options_dict(replace_args={'label': label})
-    options_dict_full = options_dict.copy()
-
     options_dict.pop('non-interactive', None)
 
     non_interactive_options_dict = {}
@@ -143,24 +203,25 @@ def test_mixed(run_cli_command):
     result = run_cli_command(computer_setup, options, user_input=user_input)
     assert result.exception is None, f'There was an unexpected exception. Output: {result.output}'
 
+    expected = dataclasses.replace(SETUP_EXPECTATIONS, label=label)
     new_computer = orm.Computer.collection.get(label=label)
     assert isinstance(new_computer, orm.Computer)
 
-    assert new_computer.description == options_dict_full['description']
-    assert new_computer.hostname == options_dict_full['hostname']
-    assert new_computer.transport_type == options_dict_full['transport']
-    assert new_computer.scheduler_type == options_dict_full['scheduler']
-    assert new_computer.get_mpirun_command() == options_dict_full['mpirun-command'].split()
-    assert new_computer.get_shebang() == options_dict_full['shebang']
-    assert new_computer.get_workdir() == options_dict_full['work-dir']
-    assert new_computer.get_default_mpiprocs_per_machine() == int(options_dict_full['mpiprocs-per-machine'])
+    assert new_computer.description == expected.description
+    assert new_computer.hostname == expected.hostname
+    assert new_computer.transport_type == expected.transport
+    assert new_computer.scheduler_type == expected.scheduler
+    assert new_computer.get_mpirun_command() == expected.mpirun_command
+    assert new_computer.get_shebang() == expected.shebang
+    assert new_computer.get_workdir() == expected.work_dir
+    assert new_computer.get_default_mpiprocs_per_machine() == expected.mpiprocs_per_machine
 
     # default_memory_per_machine should not prompt and set
     assert new_computer.get_default_memory_per_machine() is None
 
     # For now I'm not writing anything in them
-    assert new_computer.get_prepend_text() == options_dict_full['prepend-text']
-    assert new_computer.get_append_text() == options_dict_full['append-text']
+    assert new_computer.get_prepend_text() == expected.prepend_text
+    assert new_computer.get_append_text() == expected.append_text
 
 
 @pytest.mark.parametrize('non_interactive_editor', ('vim -cwq',), indirect=True)
@@ -171,78 +232,66 @@ def test_noninteractive(run_cli_command, aiida_localhost, non_interactive_editor
 
     result = run_cli_command(computer_setup, options)
 
-    new_computer = orm.Computer.collection.get(label=options_dict['label'])
+    expected = SETUP_EXPECTATIONS
+    new_computer = orm.Computer.collection.get(label=expected.label)
     assert isinstance(new_computer, orm.Computer)
 
-    assert new_computer.description == options_dict['description']
-    assert new_computer.hostname == options_dict['hostname']
-    assert new_computer.transport_type == options_dict['transport']
-    assert new_computer.scheduler_type == options_dict['scheduler']
-    assert new_computer.get_mpirun_command() == options_dict['mpirun-command'].split()
-    assert new_computer.get_shebang() == options_dict['shebang']
-    assert new_computer.get_workdir() == options_dict['work-dir']
-    assert new_computer.get_default_mpiprocs_per_machine() == int(options_dict['mpiprocs-per-machine'])
-    assert new_computer.get_default_memory_per_machine() == int(options_dict['default-memory-per-machine'])
-    assert new_computer.get_prepend_text() == options_dict['prepend-text']
-    assert new_computer.get_append_text() == options_dict['append-text']
+    assert new_computer.description == expected.description
+    assert new_computer.hostname == expected.hostname
+    assert new_computer.transport_type == expected.transport
+    assert new_computer.scheduler_type == expected.scheduler
+    assert new_computer.get_mpirun_command() == expected.mpirun_command
+    assert new_computer.get_shebang() == expected.shebang
+    assert new_computer.get_workdir() == expected.work_dir
+    assert new_computer.get_default_mpiprocs_per_machine() == expected.mpiprocs_per_machine
+    assert new_computer.get_default_memory_per_machine() == expected.default_memory_per_machine
+    assert new_computer.get_prepend_text() == expected.prepend_text
+    assert new_computer.get_append_text() == expected.append_text
 
     # Test that I cannot generate twice a computer with the same label
     result = run_cli_command(computer_setup, options, raises=True)
     assert 'already exists' in result.output
 
 
-def test_noninteractive_optional_default_mpiprocs(run_cli_command):
-    """Check that if is ok not to specify mpiprocs-per-machine"""
-    options_dict = generate_setup_options_dict({'label': 'computer_default_mpiprocs'})
-    options_dict.pop('mpiprocs-per-machine')
-    options = generate_setup_options(options_dict)
-    run_cli_command(computer_setup, options)
-
-    new_computer = orm.Computer.collection.get(label=options_dict['label'])
-    assert isinstance(new_computer, orm.Computer)
-    assert new_computer.get_default_mpiprocs_per_machine() is None
-
-
-def test_noninteractive_optional_default_mpiprocs_2(run_cli_command):
-    """Check that if is the specified value is zero, it means unspecified"""
-    options_dict = generate_setup_options_dict({'label': 'computer_default_mpiprocs_2'})
-    options_dict['mpiprocs-per-machine'] = 0
-    options = generate_setup_options(options_dict)
-    run_cli_command(computer_setup, options)
-
-    new_computer = orm.Computer.collection.get(label=options_dict['label'])
-    assert isinstance(new_computer, orm.Computer)
-    assert new_computer.get_default_mpiprocs_per_machine() is None
-
-
-def test_noninteractive_optional_default_mpiprocs_3(run_cli_command):
-    """Check that it fails for a negative number of mpiprocs"""
-    options_dict = generate_setup_options_dict({'label': 'computer_default_mpiprocs_3'})
-    options_dict['mpiprocs-per-machine'] = -1
-    options = generate_setup_options(options_dict)
-    result = run_cli_command(computer_setup, options, raises=True)
-    assert 'mpiprocs_per_machine, must be positive' in result.output
-
-
-def test_noninteractive_optional_default_memory(run_cli_command):
-    """Check that if is ok not to specify default-memory-per-machine"""
-    options_dict = generate_setup_options_dict({'label': 'computer_default_mem'})
-    options_dict.pop('default-memory-per-machine')
+@pytest.mark.parametrize(
+    'key, value, getter',
+    (
+        ('mpiprocs-per-machine', None, 'get_default_mpiprocs_per_machine'),
+        ('mpiprocs-per-machine', 0, 'get_default_mpiprocs_per_machine'),
+        ('default-memory-per-machine', None, 'get_default_memory_per_machine'),
+    ),
+    ids=('mpiprocs-omitted', 'mpiprocs-zero', 'memory-omitted'),
+)
+def test_noninteractive_optional_default(run_cli_command, key, value, getter):
+    """Check that an optional default can be left unspecified, either by omitting it or by setting it to zero."""
+    options_dict = generate_setup_options_dict({'label': f'computer_default_{key}_{value}'})
+    if value is None:
+        options_dict.pop(key)
+    else:
+        options_dict[key] = value
     options = generate_setup_options(options_dict)
     run_cli_command(computer_setup, options)
 
     new_computer = orm.Computer.collection.get(label=options_dict['label'])
     assert isinstance(new_computer, orm.Computer)
-    assert new_computer.get_default_memory_per_machine() is None
+    assert getattr(new_computer, getter)() is None
 
 
-def test_noninteractive_optional_default_memory_invalid(run_cli_command):
-    """Check that it fails for a negative number of default_memory."""
-    options_dict = generate_setup_options_dict({'label': 'computer_default_memory_3'})
-    options_dict['default-memory-per-machine'] = -1
+@pytest.mark.parametrize(
+    'key, expected',
+    (
+        ('mpiprocs-per-machine', 'mpiprocs_per_machine, must be positive'),
+        ('default-memory-per-machine', 'Invalid value for def_memory_per_machine, must be a positive int, got: -1'),
+    ),
+    ids=('mpiprocs', 'memory'),
+)
+def test_noninteractive_optional_default_invalid(run_cli_command, key, expected):
+    """Check that it fails for a negative value of an optional default."""
+    options_dict = generate_setup_options_dict({'label': f'computer_default_{key}_invalid'})
+    options_dict[key] = -1
     options = generate_setup_options(options_dict)
     result = run_cli_command(computer_setup, options, raises=True)
-    assert 'Invalid value for def_memory_per_machine, must be a positive int, got: -1' in result.output
+    assert expected in result.output
 
 
 def test_noninteractive_wrong_transport_fail(run_cli_command):
@@ -281,49 +330,65 @@ def test_noninteractive_invalid_mpirun_fail(run_cli_command):
     assert "unknown replacement field 'unknown_key'" in result.output
 
 
-def test_noninteractive_from_config(run_cli_command):
+def test_noninteractive_from_config(run_cli_command, tmp_path):
     """Test setting up a computer from a config file"""
     label = 'noninteractive_config'
+    filepath_config = tmp_path / 'computer.yml'
+    filepath_config.write_text(SETUP_CONFIG_TEMPLATE.format(label=label))
 
-    with tempfile.NamedTemporaryFile('w') as handle:
-        handle.write(
-            f"""---
-label: {label}
-hostname: myhost
-transport: core.local
-scheduler: core.direct
-"""
-        )
-        handle.flush()
-
-        options = ['--non-interactive', '--config', os.path.realpath(handle.name)]
-        run_cli_command(computer_setup, options)
+    options = ['--non-interactive', '--config', str(filepath_config)]
+    run_cli_command(computer_setup, options)
 
     assert isinstance(orm.Computer.collection.get(label=label), orm.Computer)
 
 
+# The attributes, except for the label and transport, of the computers used to test ``verdi computer configure``
+CONFIGURE_COMPUTER_TEMPLATE = types.MappingProxyType(
+    {
+        'hostname': 'localhost',
+        'description': 'Test Computer',
+        'scheduler': 'core.direct',
+        'work_dir': '/tmp/aiida',
+        'use_double_quotes': False,
+        'prepend_text': '',
+        'append_text': '',
+        'mpiprocs_per_machine': 8,
+        'default_memory_per_machine': 100000,
+        'mpirun_command': 'mpirun',
+        'shebang': '#!xonsh',
+    }
+)
+
+
+@pytest.fixture
+def make_computer(request):
+    """Return a factory to create a stored computer from the ``CONFIGURE_COMPUTER_TEMPLATE`` with a given transport.
+
+    The label is derived from the name of the test and the transport. All computers created by the factory are deleted
+    after the test.
+    """
+    computers = []
+
+    def factory(transport):
+        label = f'{request.node.name}_{transport}'
+        computer = ComputerBuilder(**CONFIGURE_COMPUTER_TEMPLATE, label=label, transport=transport).new().store()
+        computers.append(computer)
+        return computer
+
+    yield factory
+
+    for computer in computers:
+        orm.Computer.collection.delete(computer.pk)
+
+
 class TestVerdiComputerConfigure:
     """Test the ``verdi computer configure`` command."""
 
     @pytest.fixture(autouse=True)
     def init_profile(self, run_cli_command):
         """Initialize the profile."""
-        from aiida.orm.utils.builders.computer import ComputerBuilder
-
         self.cli_runner = run_cli_command
         self.user = orm.User.collection.get_default()
-        self.comp_builder = ComputerBuilder(label='test_comp_setup')
-        self.comp_builder.hostname = 'localhost'
-        self.comp_builder.description = 'Test Computer'
-        self.comp_builder.scheduler = 'core.direct'
-        self.comp_builder.work_dir = '/tmp/aiida'
-        self.comp_builder.use_double_quotes = False
-        self.comp_builder.prepend_text = ''
-        self.comp_builder.append_text = ''
-        self.comp_builder.mpiprocs_per_machine = 8
-        self.comp_builder.default_memory_per_machine = 100000
-        self.comp_builder.mpirun_command = 'mpirun'
-        self.comp_builder.shebang = '#!xonsh'
 
     def test_top_help(self):
         """Test help option of verdi computer configure."""
@@ -331,16 +396,13 @@ class TestVerdiComputerConfigure:
         assert 'core.ssh' in result.output
         assert 'core.local' in result.output
 
-    def test_reachable(self):
+    @pytest.mark.parametrize('subcommand', ([], ['core.local'], ['core.ssh'], ['show']))
+    def test_reachable(self, subcommand):
         """Test reachability of top level and sub commands."""
-        import subprocess as sp
-
-        sp.check_output(['verdi', 'computer', 'configure', '--help'])
-        sp.check_output(['verdi', 'computer', 'configure', 'core.local', '--help'])
-        sp.check_output(['verdi', 'computer', 'configure', 'core.ssh', '--help'])
-        sp.check_output(['verdi', 'computer', 'configure', 'show', '--help'])
+        result = self.cli_runner(verdi_computer, ['configure', *subcommand, '--help'])
+        assert 'Usage:' in result.output
 
-    def test_local_ni_empty(self):
+    def test_local_ni_empty(self, make_computer):
         """Test verdi computer configure core.local <comp>
 
         Test twice, with comp setup for local or ssh.
@@ -348,31 +410,21 @@ class TestVerdiComputerConfigure:
          * with computer setup for local: should succeed
          * with computer setup for ssh: should fail
         """
-        self.comp_builder.label = 'test_local_ni_empty'
-        self.comp_builder.transport = 'core.local'
-        comp = self.comp_builder.new()
-        comp.store()
+        comp = make_computer(transport='core.local')
+        comp_mismatch = make_computer(transport='core.ssh')
 
         options = ['core.local', comp.label, '--non-interactive', '--safe-interval', '0']
         result = self.cli_runner(computer_configure, options)
         assert comp.is_configured, result.output
 
-        self.comp_builder.label = 'test_local_ni_empty_mismatch'
-        self.comp_builder.transport = 'core.ssh'
-        comp_mismatch = self.comp_builder.new()
-        comp_mismatch.store()
-
         options = ['core.local', comp_mismatch.label, '--non-interactive']
         result = self.cli_runner(computer_configure, options, raises=True)
         assert 'core.ssh' in result.output
         assert 'core.local' in result.output
 
-    def test_local_interactive(self):
+    def test_local_interactive(self, make_computer):
         """Test computer configuration for local transports."""
-        self.comp_builder.label = 'test_local_interactive'
-        self.comp_builder.transport = 'core.local'
-        comp = self.comp_builder.new()
-        comp.store()
+        comp = make_computer(transport='core.local')
 
         invalid = 'n'
         valid = '1.0'
@@ -383,7 +435,7 @@ class TestVerdiComputerConfigure:
         assert new_auth_params['safe_interval'] == 1.0
         assert new_auth_params['use_login_shell'] is False
 
-    def test_ssh_interactive(self):
+    def test_ssh_interactive(self, make_computer):
         """Check that the interactive prompt is accepting the correct values.
 
         Actually, even passing a shorter set of options should work:
@@ -391,10 +443,7 @@ class TestVerdiComputerConfigure:
         parameters reading from the ssh config file.
         We are here therefore only checking some of them.
         """
-        self.comp_builder.label = 'test_ssh_interactive'
-        self.comp_builder.transport = 'core.ssh'
-        comp = self.comp_builder.new()
-        comp.store()
+        comp = make_computer(transport='core.ssh')
 
         remote_username = 'some_remote_user'
         port = 345
@@ -413,35 +462,22 @@ class TestVerdiComputerConfigure:
         assert new_auth_params['look_for_keys'] == look_for_keys
         assert new_auth_params['use_login_shell'] is True
 
-    def test_local_from_config(self):
+    def test_local_from_config(self, make_computer, tmp_path):
         """Test configuring a computer from a config file"""
-        label = 'test_local_from_config'
-        self.comp_builder.label = label
-        self.comp_builder.transport = 'core.local'
-        computer = self.comp_builder.new()
-        computer.store()
+        computer = make_computer(transport='core.local')
 
         interval = 20
         use_login_shell = False
+        filepath_config = tmp_path / 'computer.yml'
+        filepath_config.write_text(CONFIGURE_CONFIG_TEMPLATE.format(interval=interval, use_login_shell=use_login_shell))
 
-        with tempfile.NamedTemporaryFile('w') as handle:
-            handle.write(
-                textwrap.dedent(
-                    f"""---
-                    safe_interval: {interval}
-                    use_login_shell: {use_login_shell}
-                    """
-                )
-            )
-            handle.flush()
-
-            options = ['core.local', computer.label, '--config', os.path.realpath(handle.name)]
-            self.cli_runner(computer_configure, options)
+        options = ['core.local', computer.label, '--config', str(filepath_config)]
+        self.cli_runner(computer_configure, options)
 
         assert computer.get_configuration()['safe_interval'] == interval
         assert computer.get_configuration()['use_login_shell'] == use_login_shell
 
-    def test_ssh_ni_empty(self):
+    def test_ssh_ni_empty(self, make_computer):
         """Test verdi computer configure core.ssh <comp>
 
         Test twice, with comp setup for ssh or local.
@@ -449,31 +485,21 @@ class TestVerdiComputerConfigure:
          * with computer setup for ssh: should succeed
          * with computer setup for local: should fail
         """
-        self.comp_builder.label = 'test_ssh_ni_empty'
-        self.comp_builder.transport = 'core.ssh'
-        comp = self.comp_builder.new()
-        comp.store()
+        comp = make_computer(transport='core.ssh')
+        comp_mismatch = make_computer(transport='core.local')
 
         options = ['core.ssh', comp.label, '--non-interactive', '--safe-interval', '1']
         result = self.cli_runner(computer_configure, options)
         assert comp.is_configured, result.output
 
-        self.comp_builder.label = 'test_ssh_ni_empty_mismatch'
-        self.comp_builder.transport = 'core.local'
-        comp_mismatch = self.comp_builder.new()
-        comp_mismatch.store()
-
         options = ['core.ssh', comp_mismatch.label, '--non-interactive']
         result = self.cli_runner(computer_configure, options, raises=True)
         assert 'core.local' in result.output
         assert 'core.ssh' in result.output
 
-    def test_ssh_ni_username(self):
+    def test_ssh_ni_username(self, make_computer):
         """Test verdi computer configure core.ssh <comp> --username=<username>."""
-        self.comp_builder.label = 'test_ssh_ni_username'
-        self.comp_builder.transport = 'core.ssh'
-        comp = self.comp_builder.new()
-        comp.store()
+        comp = make_computer(transport='core.ssh')
 
         username = 'TEST'
         options = ['core.ssh', comp.label, '--non-interactive', f'--username={username}', '--safe-interval', '1']
@@ -482,12 +508,9 @@ class TestVerdiComputerConfigure:
         assert comp.is_configured, result.output
         assert auth_info.get_auth_params()['username'] == username
 
-    def test_show(self):
+    def test_show(self, make_computer):
         """Test verdi computer configure show <comp>."""
-        self.comp_builder.label = 'test_show'
-        self.comp_builder.transport = 'core.ssh'
-        comp = self.comp_builder.new()
-        comp.store()
+        comp = make_computer(transport='core.ssh')
 
         result = self.cli_runner(computer_configure, ['show', comp.label])
 
@@ -517,19 +540,54 @@ class TestVerdiComputerCommands:
     Testing everything besides `computer setup`.
     """
 
+    computer_name = 'comp_cli_test_computer'
+
+    @pytest.fixture(scope='class')
+    def shared_computer(self, tmp_path_factory):
+        """Return a stored and configured computer that is shared by all tests of this class.
+
+        Setting up the computer requires multiple database operations, so it is only done once for the whole class. The
+        computer is deleted once all tests of the class have run.
+        """
+        computer = orm.Computer(
+            label=self.computer_name,
+            hostname='localhost',
+            transport_type='core.local',
+            scheduler_type='core.direct',
+            workdir=str(tmp_path_factory.mktemp('workdir')),
+        )
+        computer.set_default_mpiprocs_per_machine(1)
+        computer.set_default_memory_per_machine(1000000)
+        computer.set_prepend_text('text to prepend')
+        computer.set_append_text('text to append')
+        computer.store()
+        computer.configure()
+        assert computer.is_configured, 'There was a problem configuring the test computer'
+        yield computer
+        orm.Computer.collection.delete(computer.pk)
+
+    @pytest.fixture
+    def comp(self, shared_computer, request):
+        """Return the computer for the current test.
+
+        Tests marked with ``mutates_computer`` get an unconfigured copy of the shared computer, with a label that is
+        unique to the test, which is deleted afterwards. All other tests only read the shared computer and get it as is.
+        """
+        if request.node.get_closest_marker('mutates_computer') is None:
+            yield shared_computer
+            return
+
+        spec = ComputerBuilder.get_computer_spec(shared_computer)
+        spec['label'] = f'{self.computer_name}_{request.node.name}'
+        computer = ComputerBuilder(**spec).new().store()
+        yield computer
+        orm.Computer.collection.delete(computer.pk)
+
     @pytest.fixture(autouse=True)
-    def init_profile(self, aiida_computer, run_cli_command):
+    def init_profile(self, comp, run_cli_command):
         """Initialize the profile."""
-        self.computer_name = 'comp_cli_test_computer'
-        self.comp = aiida_computer(label=self.computer_name)
-        self.comp.set_default_mpiprocs_per_machine(1)
-        self.comp.set_default_memory_per_machine(1000000)
-        self.comp.set_prepend_text('text to prepend')
-        self.comp.set_append_text('text to append')
-        self.comp.store()
-        self.comp.configure()
+        self.comp = comp
         self.user = orm.User.collection.get_default()
-        assert self.comp.is_configured, 'There was a problem configuring the test computer'
         self.cli_runner = run_cli_command
 
     def test_computer_test(self):
@@ -547,54 +605,54 @@ class TestVerdiComputerCommands:
         """Test if 'verdi computer list' command works"""
         # Check the vanilla command works
         result = self.cli_runner(computer_list, [])
-        # Something should be printed to stdout
-        assert result.output is not None
+        # The configured test computer should be listed
+        assert self.comp.label in result.output
 
         # Check all options run
         for opt in ['-r', '--raw', '-a', '--all']:
             result = self.cli_runner(computer_list, [opt])
-            # Something should be printed to stdout
-            assert result.output is not None
+            assert self.comp.label in result.output
 
     def test_computer_show(self):
         """Test if 'verdi computer show' command works"""
         # See if we can display info about the test computer.
         result = self.cli_runner(computer_show, ['comp_cli_test_computer'])
-        # Something should be printed to stdout
-        assert result.output is not None
+        assert self.comp.label in result.output
+        assert self.comp.hostname in result.output
 
         # See if a non-existent computer will raise an error.
         result = self.cli_runner(computer_show, 'non_existent_computer_name', raises=True)
 
+    @pytest.mark.mutates_computer
     def test_computer_relabel(self):
         """Test if 'verdi computer relabel' command works"""
-        from aiida.common.exceptions import NotExistent
+        label = self.comp.label
 
         # See if the command complains about not getting an invalid computer
         options = ['not_existent_computer_label']
         self.cli_runner(computer_relabel, options, raises=True)
 
         # See if the command complains about not getting both labels
-        options = ['comp_cli_test_computer']
+        options = [label]
         self.cli_runner(computer_relabel, options, raises=True)
 
         # The new label must be different to the old one
-        options = ['comp_cli_test_computer', 'comp_cli_test_computer']
+        options = [label, label]
         self.cli_runner(computer_relabel, options, raises=True)
 
         # Change a computer label successully.
-        options = ['comp_cli_test_computer', 'relabeled_test_computer']
+        options = [label, 'relabeled_test_computer']
         self.cli_runner(computer_relabel, options)
 
         # Check that the label really was changed
         # The old label should not be available
         with pytest.raises(NotExistent):
-            orm.Computer.collection.get(label='comp_cli_test_computer')
+            orm.Computer.collection.get(label=label)
         # The new label should be available
         orm.Computer.collection.get(label='relabeled_test_computer')
 
         # Now change the label back
-        options = ['relabeled_test_computer', 'comp_cli_test_computer']
+        options = ['relabeled_test_computer', label]
         self.cli_runner(computer_relabel, options)
 
         # Check that the label really was changed
@@ -602,12 +660,10 @@ class TestVerdiComputerCommands:
         with pytest.raises(NotExistent):
             orm.Computer.collection.get(label='relabeled_test_computer')
         # The new label should be available
-        orm.Computer.collection.get(label='comp_cli_test_computer')
+        orm.Computer.collection.get(label=label)
 
     def test_computer_delete(self):
         """Test if 'verdi computer delete' command works"""
-        from aiida.common.exceptions import NotExistent
-
         # Setup a computer to delete during the test
         label = 'computer_for_test_label'
         orm.Computer(
@@ -631,16 +687,8 @@ class TestVerdiComputerCommands:
             orm.Computer.collection.get(label=label)
 
 
-@pytest.mark.parametrize('non_interactive_editor', ('vim -cwq',), indirect=True)
-def test_computer_duplicate_interactive(run_cli_command, aiida_localhost, non_interactive_editor):
-    """Test 'verdi computer duplicate' in interactive mode."""
-    label = 'computer_duplicate_interactive'
-    computer = aiida_localhost
-    user_input = f'{label}\n\n\n\n\n\n\n\n\n\n'
-    result = run_cli_command(computer_duplicate, [str(computer.pk)], user_input=user_input)
-    assert result.exception is None, result.output
-
-    new_computer = orm.Computer.collection.get(label=label)
+def _assert_computer_duplicated(new_computer, computer):
+    """Assert that ``new_computer`` has the same attributes as ``computer``, except for the label."""
     assert new_computer.description == computer.description
     assert new_computer.hostname == computer.hostname
     assert new_computer.transport_type == computer.transport_type
@@ -654,27 +702,24 @@ def test_computer_duplicate_interactive(run_cli_command, aiida_localhost, non_in
 
 
 @pytest.mark.parametrize('non_interactive_editor', ('vim -cwq',), indirect=True)
-def test_computer_duplicate_non_interactive(run_cli_command, aiida_localhost, non_interactive_editor):
-    """Test if 'verdi computer duplicate' in non-interactive mode."""
-    label = 'computer_duplicate_noninteractive'
+@pytest.mark.parametrize('interactive', (True, False))
+def test_computer_duplicate(run_cli_command, aiida_localhost, non_interactive_editor, interactive):
+    """Test 'verdi computer duplicate' in interactive and non-interactive mode."""
     computer = aiida_localhost
-    result = run_cli_command(computer_duplicate, ['--non-interactive', f'--label={label}', str(computer.pk)])
-    assert result.exception is None, result.output
 
-    new_computer = orm.Computer.collection.get(label=label)
-    assert new_computer.description == computer.description
-    assert new_computer.hostname == computer.hostname
-    assert new_computer.transport_type == computer.transport_type
-    assert new_computer.scheduler_type == computer.scheduler_type
-    assert new_computer.get_shebang() == computer.get_shebang()
-    assert new_computer.get_workdir() == computer.get_workdir()
-    assert new_computer.get_mpirun_command() == computer.get_mpirun_command()
-    assert new_computer.get_default_mpiprocs_per_machine() == computer.get_default_mpiprocs_per_machine()
-    assert new_computer.get_prepend_text() == computer.get_prepend_text()
-    assert new_computer.get_append_text() == computer.get_append_text()
+    if interactive:
+        label = 'computer_duplicate_interactive'
+        user_input = f'{label}\n\n\n\n\n\n\n\n\n\n'
+        result = run_cli_command(computer_duplicate, [str(computer.pk)], user_input=user_input)
+    else:
+        label = 'computer_duplicate_noninteractive'
+        result = run_cli_command(computer_duplicate, ['--non-interactive', f'--label={label}', str(computer.pk)])
 
+    assert result.exception is None, result.output
+    _assert_computer_duplicated(orm.Computer.collection.get(label=label), computer)
 
-@pytest.mark.parametrize('non_interactive_editor', ('sleep 1; vim -cwq',), indirect=True)
+
+@pytest.mark.parametrize('non_interactive_editor', ('true',), indirect=True)
 def test_direct_interactive(run_cli_command, non_interactive_editor):
     """Test verdi computer setup in interactive mode."""
     label = 'interactive_computer'
@@ -692,69 +737,80 @@ def test_direct_interactive(run_cli_command, non_interactive_editor):
     result = run_cli_command(computer_setup, user_input=user_input)
     assert result.exception is None, f'There was an unexpected exception. Output: {result.output}'
 
+    expected = dataclasses.replace(SETUP_EXPECTATIONS, label=label)
     new_computer = orm.Computer.collection.get(label=label)
     assert isinstance(new_computer, orm.Computer)
 
-    assert new_computer.description == options_dict['description']
-    assert new_computer.hostname == options_dict['hostname']
-    assert new_computer.transport_type == options_dict['transport']
-    assert new_computer.scheduler_type == options_dict['scheduler']
-    assert new_computer.get_mpirun_command() == options_dict['mpirun-command'].split()
-    assert new_computer.get_shebang() == options_dict['shebang']
-    assert new_computer.get_workdir() == options_dict['work-dir']
-    assert new_computer.get_default_mpiprocs_per_machine() == int(options_dict['mpiprocs-per-machine'])
+    assert new_computer.description == expected.description
+    assert new_computer.hostname == expected.hostname
+    assert new_computer.transport_type == expected.transport
+    assert new_computer.scheduler_type == expected.scheduler
+    assert new_computer.get_mpirun_command() == expected.mpirun_command
+    assert new_computer.get_shebang() == expected.shebang
+    assert new_computer.get_workdir() == expected.work_dir
+    assert new_computer.get_default_mpiprocs_per_machine() == expected.mpiprocs_per_machine
     # For now I'm not writing anything in them
     assert new_computer.get_prepend_text() == ''
     assert new_computer.get_append_text() == ''
 
 
-def test_computer_test_stderr(run_cli_command, aiida_localhost, monkeypatch):
-    """Test `verdi computer test` where tested command returns non-empty stderr."""
-    from aiida.transports.plugins.local import LocalTransport
-
-    aiida_localhost.configure()
-    stderr = 'spurious output in standard error'
-
-    def exec_command_wait(self, command, **kwargs):
-        return 0, '', stderr
-
-    monkeypatch.setattr(LocalTransport, 'exec_command_wait', exec_command_wait)
-
-    result = run_cli_command(computer_test, [aiida_localhost.label], use_subprocess=False)
-    assert 'Warning: 1 out of 6 tests failed' in result.output
-    assert stderr in result.output
-
-
-def test_computer_test_stdout(run_cli_command, aiida_localhost, monkeypatch):
-    """Test `verdi computer test` where tested command returns non-empty stdout."""
-    from aiida.transports.plugins.local import LocalTransport
-
-    aiida_localhost.configure()
-    stdout = 'spurious output in standard output'
-
-    def exec_command_wait(self, command, **kwargs):
-        return 0, stdout, ''
-
-    monkeypatch.setattr(LocalTransport, 'exec_command_wait', exec_command_wait)
-
-    result = run_cli_command(computer_test, [aiida_localhost.label], use_subprocess=False)
-    assert 'Warning: 1 out of 6 tests failed' in result.output
-    assert stdout in result.output
-
-
-def test_computer_test_use_login_shell(run_cli_command, aiida_localhost, monkeypatch):
-    """Test ``verdi computer test`` where ``use_login_shell=True`` is much slower."""
-    from aiida.cmdline.commands import cmd_computer
+# The checks run by ``verdi computer test``, which must be kept in sync with the ``tests`` table in
+# ``cmd_computer.computer_test``. The command reports one more test than there are checks, for opening the connection.
+# A check that is missing here runs for real and changes that count, which makes ``test_computer_test_checks`` fail.
+COMPUTER_TEST_CHECKS = (
+    '_computer_test_no_unexpected_output',
+    '_computer_test_get_jobs',
+    '_computer_get_remote_username',
+    '_computer_create_temp_file',
+    '_computer_use_login_shell_performance',
+)
+NUM_COMPUTER_TESTS = len(COMPUTER_TEST_CHECKS) + 1
+
+
+@pytest.mark.parametrize(
+    'check, patch_target, patch_impl, expected',
+    (
+        (
+            '_computer_test_no_unexpected_output',
+            (LocalTransport, 'exec_command_wait'),
+            lambda self, command, **kwargs: (0, '', 'spurious output in standard error'),
+            (f'Warning: 1 out of {NUM_COMPUTER_TESTS} tests failed', 'spurious output in standard error'),
+        ),
+        (
+            '_computer_test_no_unexpected_output',
+            (LocalTransport, 'exec_command_wait'),
+            lambda self, command, **kwargs: (0, 'spurious output in standard output', ''),
+            (f'Warning: 1 out of {NUM_COMPUTER_TESTS} tests failed', 'spurious output in standard output'),
+        ),
+        (
+            '_computer_use_login_shell_performance',
+            (cmd_computer, 'time_use_login_shell'),
+            lambda authinfo, auth_params, use_login_shell, iterations: 0.21 if use_login_shell else 0.10,
+            (
+                f'Success: all {NUM_COMPUTER_TESTS} tests succeeded',
+                'computer is configured to use a login shell, which is slower compared to a normal shell',
+            ),
+        ),
+    ),
+    ids=('stderr', 'stdout', 'use_login_shell'),
+)
+def test_computer_test_checks(run_cli_command, aiida_localhost, monkeypatch, check, patch_target, patch_impl, expected):
+    """Test the output of ``verdi computer test`` for a single check whose behavior is patched.
 
-    aiida_localhost.configure()
+    All other checks are replaced with checks that pass, such that the command output only depends on ``check``. The
+    command still counts the connection and all checks in the number of tests that it reports.
 
-    def time_use_login_shell(authinfo, auth_params, use_login_shell, iterations) -> float:
-        if use_login_shell:
-            return 0.21
-        return 0.10
+    :param check: the name of the check function in ``cmd_computer`` that is under test
+    :param patch_target: tuple of the object and the name of its attribute that is replaced by ``patch_impl``
+    :param patch_impl: the implementation that replaces ``patch_target``
+    :param expected: the strings that should be contained in the command output
+    """
+    for other_check in COMPUTER_TEST_CHECKS:
+        if other_check != check:
+            monkeypatch.setattr(cmd_computer, other_check, lambda **kwargs: (True, None))
 
-    monkeypatch.setattr(cmd_computer, 'time_use_login_shell', time_use_login_shell)
+    monkeypatch.setattr(*patch_target, patch_impl)
 
     result = run_cli_command(computer_test, [aiida_localhost.label], use_subprocess=False)
-    assert 'Success: all 6 tests succeeded' in result.output
-    assert 'computer is configured to use a login shell, which is slower compared to a normal shell' in result.output
+    for string in expected:
+        assert string in result.output
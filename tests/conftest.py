@@ -32,6 +32,39 @@ if t.TYPE_CHECKING:
 pytest_plugins = ['aiida.manage.tests.pytest_fixtures', 'sphinx.testing.fixtures']
 
 
+def pytest_configure(config):
+    """Give each ``pytest-xdist`` worker its own test profile when one is defined through ``AIIDA_TEST_PROFILE``.
+
+    Workers would otherwise all share the same storage. Each worker instead uses the profile whose name is suffixed with
+    the worker id, e.g. ``test_aiida_gw0`` and ``test_aiida_gw1`` for ``-n 2``, which have to be created beforehand.
+
+    :raises pytest.UsageError: if the profile of a worker does not exist.
+    """
+    from aiida.common.exceptions import ConfigurationError
+
+    worker = os.environ.get('PYTEST_XDIST_WORKER')
+    profile_name = os.environ.get('AIIDA_TEST_PROFILE')
+
+    if not worker or not profile_name:
+        return
+
+    worker_profile_name = f'{profile_name}_{worker}'
+
+    try:
+        profile_names = get_config().profile_names
+    except ConfigurationError:
+        profile_names = []
+
+    if worker_profile_name not in profile_names:
+        raise pytest.UsageError(
+            f'running in parallel with `AIIDA_TEST_PROFILE={profile_name}` requires a test profile for each worker, '
+            f'but `{worker_profile_name}` does not exist. Create a test profile `{profile_name}_gw<N>` for each '
+            'worker, or unset `AIIDA_TEST_PROFILE` to have each worker create its own temporary profile.'
+        )
+
+    os.environ['AIIDA_TEST_PROFILE'] = worker_profile_name
+
+
 @pytest.fixture()
 def non_interactive_editor(request):
     """Fixture to patch click's `Editor.edit_file`.